@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import calendar
+import dataclasses
 
 import inspect
 import logging
@@ -28,6 +29,7 @@ from homeassistant.exceptions import HomeAssistantError
 from homeassistant.config_entries import ConfigEntry
 
 from homeassistant.helpers import config_validation as cv, entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 try:
     from homeassistant.helpers.network import async_get_url
@@ -84,7 +86,11 @@ from .const import (
     SERVICE_GENERATE_REPORT,
     VALID_PERIODS,
 )
-from .ai_helper import generate_advice, get_fallback_message
+from .ai_helper import (
+    async_load_advice_cache,
+    generate_advice,
+    get_fallback_message,
+)
 from .pdf import (
     EnergyPDFBuilder,
     TableConfig,
@@ -328,6 +334,8 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 
     hass.data.setdefault(DOMAIN, {})
 
+    await async_load_advice_cache(hass)
+
     _async_register_services(hass)
 
     return True
@@ -833,6 +841,7 @@ async def _async_handle_generate(hass: HomeAssistant, call: ServiceCall) -> None
         api_key = None
 
     advice_text = await generate_advice(
+        async_get_clientsession(hass),
         conclusion_prompt_text,
         api_key,
         translations.language,
@@ -2307,8 +2316,11 @@ def _build_pdf(
             comparison_summary=comparison_conclusion_summary,
         )
 
-        comparison_table.column_widths = builder.compute_column_widths(
-            (0.38, 0.2, 0.2, 0.11, 0.11)
+        comparison_table = dataclasses.replace(
+            comparison_table,
+            column_widths=builder.compute_column_widths(
+                (0.38, 0.2, 0.2, 0.11, 0.11)
+            ),
         )
 
         builder.add_section_title(translations.comparison_section_title)
@@ -3,16 +3,36 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import logging
-from typing import Final
+import random
+import time
+from typing import Any, Final
 
 import aiohttp
 
-FALLBACK_MESSAGES: Final[dict[str, str]] = {
-    "fr": "La fonction n’est pas active actuellement.",
-    "en": "This feature is currently not active.",
-    "nl": "Deze functie is momenteel niet actief.",
-}
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.storage import Store
+from homeassistant.util.json import json_loads
+
+from .const import DOMAIN
+
+
+class _LanguageDict(dict):
+    """Dictionnaire indexé par langue qui retombe sur le français."""
+
+    def __missing__(self, key: str) -> Any:
+        return self["fr"]
+
+
+FALLBACK_MESSAGES: Final[dict[str, str]] = _LanguageDict(
+    {
+        "fr": "La fonction n’est pas active actuellement.",
+        "en": "This feature is currently not active.",
+        "nl": "Deze functie is momenteel niet actief.",
+    }
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -34,114 +54,394 @@ _SYSTEM_PROMPTS: Final[dict[str, str]] = {
     ),
 }
 
-_USER_INSTRUCTIONS: Final[dict[str, str]] = {
-    "fr": (
-        "Conclusion du rapport ci-dessous. Formule un conseil professionnel, orienté B2B, "
-        "en t’appuyant sur les constats fournis."
-    ),
-    "en": (
-        "The following report conclusion summarises the situation. Provide a professional, B2B-oriented "
-        "piece of advice based on it."
-    ),
-    "nl": (
-        "De onderstaande conclusie van het rapport vat de situatie samen. Formuleer op basis hiervan een professioneel,"
-        "B2B-georiënteerd advies, duidelijk gestructureerd in meerdere genummerde aanbevelingen of actiepunten (minimaal 3), elk voorzien van een korte en concrete toelichting die relevant is voor de organisatiecontext."
-    ),
+_USER_INSTRUCTIONS: Final[dict[str, str]] = _LanguageDict(
+    {
+        "fr": (
+            "Conclusion du rapport ci-dessous. Formule un conseil professionnel, orienté B2B, "
+            "en t’appuyant sur les constats fournis."
+        ),
+        "en": (
+            "The following report conclusion summarises the situation. Provide a professional, B2B-oriented "
+            "piece of advice based on it."
+        ),
+        "nl": (
+            "De onderstaande conclusie van het rapport vat de situatie samen. Formuleer op basis hiervan een professioneel,"
+            "B2B-georiënteerd advies, duidelijk gestructureerd in meerdere genummerde aanbevelingen of actiepunten (minimaal 3), elk voorzien van een korte en concrete toelichting die relevant is voor de organisatiecontext."
+        ),
+    }
+)
+
+_BASE_PAYLOAD: Final[dict[str, Any]] = {
+    "model": "gpt-4o-mini",
+    "temperature": 0.6,
+    "max_tokens": 600,
 }
 
+_CONCLUSION_PLACEHOLDER: Final[str] = "__CONCLUSION__"
+
+
+def _build_payload_template(language: str) -> bytes:
+    """Sérialiser une fois la requête d'une langue, conclusion à insérer."""
+
+    payload = {
+        **_BASE_PAYLOAD,
+        "messages": [
+            {"role": "system", "content": _SYSTEM_PROMPTS[language]},
+            {
+                "role": "user",
+                # Partie fixe en tête, conclusion variable en fin de message
+                # pour maximiser le préfixe commun mis en cache par OpenAI.
+                "content": (
+                    f"Instruction : {_USER_INSTRUCTIONS[language]}\n\n"
+                    f"Conclusion :\n{_CONCLUSION_PLACEHOLDER}"
+                ),
+            },
+        ],
+    }
+    return json_bytes(payload)
+
+
+_PAYLOAD_TEMPLATES: Final[dict[str, bytes]] = _LanguageDict(
+    {language: _build_payload_template(language) for language in _SYSTEM_PROMPTS}
+)
+
 _API_URL: Final[str] = "https://api.openai.com/v1/chat/completions"
+_BASE_HEADERS: Final[dict[str, str]] = {
+    "Accept": "application/json",
+    "Content-Type": "application/json",
+}
+_REQUEST_TIMEOUT: Final[aiohttp.ClientTimeout] = aiohttp.ClientTimeout(total=25)
+
+# Budget approximatif (~4 caractères par jeton) pour rester loin de la
+# fenêtre de contexte du modèle : 6000 jetons dont 3000 en tête et 2000 en fin.
+_CONCLUSION_MAX_CHARS: Final[int] = 24_000
+_CONCLUSION_HEAD_CHARS: Final[int] = 12_000
+_CONCLUSION_TAIL_CHARS: Final[int] = 8_000
+_TRUNCATION_MARKER: Final[str] = "\n[...]\n"
+
+_MAX_ATTEMPTS: Final[int] = 3
+_RETRY_STATUSES: Final[frozenset[int]] = frozenset({429, 500, 502, 503, 504})
+_RETRY_BASE_DELAY: Final[float] = 0.25
+_RETRY_MAX_DELAY: Final[float] = 8.0
+
+_CACHE_TTL_NS: Final[int] = 3600 * 1_000_000_000
+_CACHE_MAX_ENTRIES: Final[int] = 256
+
+# Conseils déjà générés, indexés par empreinte (langue, conclusion).
+# Le dictionnaire conserve l'ordre d'insertion : la première clé est la plus ancienne.
+_RESPONSE_CACHE: dict[str, tuple[int, str]] = {}
+
+_STORAGE_VERSION: Final[int] = 1
+_STORAGE_KEY: Final[str] = f"{DOMAIN}.advice_cache"
+_STORAGE_SAVE_DELAY: Final[float] = 10.0
+
+# Stockage persistant du cache, initialisé par async_load_advice_cache.
+_STORE: Store[dict[str, Any]] | None = None
+
+# Requêtes en cours, partagées entre les appels simultanés pour une même clé.
+_INFLIGHT: dict[str, asyncio.Task[str | None]] = {}
 
 
 def get_fallback_message(language: str) -> str:
     """Return the localized fallback message, defaulting to French."""
 
-    return FALLBACK_MESSAGES.get(language, FALLBACK_MESSAGES["fr"])
+    return FALLBACK_MESSAGES[language]
 
 
-async def generate_advice(conclusion: str, api_key: str | None, language: str) -> str:
-    """Générer un conseil professionnel personnalisé depuis OpenAI."""
+def _parse_retry_after(value: str | None) -> float | None:
+    """Convertir un en-tête Retry-After exprimé en secondes."""
 
-    normalized_api_key = (api_key or "").strip()
-    conclusion_text = (conclusion or "").strip()
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        return None
+    return max(0.0, delay)
 
-    fallback_message = get_fallback_message(language)
 
-    if not normalized_api_key:
-        return fallback_message
+def _retry_delay(attempt: int) -> float:
+    """Calculer une attente aléatoire croissante avant une nouvelle tentative."""
 
-    if not conclusion_text:
-        return fallback_message
+    return random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2**attempt))
 
-    system_prompt = _SYSTEM_PROMPTS.get(language, _SYSTEM_PROMPTS["fr"])
-    user_instruction = _USER_INSTRUCTIONS.get(language, _USER_INSTRUCTIONS["fr"])
 
-    payload = {
-        "model": "gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": f"Conclusion :\n{conclusion_text}\n\nInstruction : {user_instruction}",
-            },
-        ],
-        "temperature": 0.6,
-        "max_tokens": 600,
-    }
+async def _async_request_completion(
+    session: aiohttp.ClientSession,
+    body: bytes,
+    headers: dict[str, str],
+) -> bytes | None:
+    """Envoyer la requête à OpenAI en réessayant les erreurs transitoires.
 
-    headers = {
-        "Authorization": f"Bearer {normalized_api_key}",
-        "Content-Type": "application/json",
-    }
+    Retourne le corps brut de la réponse, ou ``None`` en cas d'échec.
+    """
 
-    try:
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=25)
-        ) as session:
+    for attempt in range(_MAX_ATTEMPTS):
+        last_attempt = attempt == _MAX_ATTEMPTS - 1
+        retry_after: float | None = None
+        try:
             async with session.post(
                 _API_URL,
-                json=payload,
+                data=body,
                 headers=headers,
+                timeout=_REQUEST_TIMEOUT,
             ) as response:
-                if response.status != 200:
-                    body = await response.text()
+                if response.status == 200:
+                    return await response.read()
+
+                error_body = await response.text()
+                if response.status not in _RETRY_STATUSES or last_attempt:
+                    _LOGGER.warning(
+                        "OpenAI API error (status: %s): %s",
+                        response.status,
+                        error_body,
+                    )
+                    return None
+
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None and retry_after > _RETRY_MAX_DELAY:
                     _LOGGER.warning(
-                        "OpenAI API error (status: %s): %s", response.status, body
+                        "OpenAI API error (status: %s), retry requested in %s s: %s",
+                        response.status,
+                        retry_after,
+                        error_body,
                     )
-                    return fallback_message
+                    return None
 
-                data = await response.json()
-    except asyncio.TimeoutError:
-        _LOGGER.warning("OpenAI API request timed out")
+                _LOGGER.debug(
+                    "OpenAI API returned status %s, retrying", response.status
+                )
+        except asyncio.TimeoutError:
+            # Une nouvelle tentative doublerait une attente déjà longue.
+            _LOGGER.warning("OpenAI API request timed out")
+            return None
+        except aiohttp.ClientError as err:
+            if last_attempt:
+                _LOGGER.warning("OpenAI API request failed: %s", err)
+                return None
+            _LOGGER.debug("OpenAI API request failed, retrying: %s", err)
+
+        await asyncio.sleep(
+            retry_after if retry_after is not None else _retry_delay(attempt)
+        )
+
+    return None
+
+
+def _truncate_conclusion(conclusion_text: str) -> str:
+    """Tronquer le milieu d'une conclusion trop longue pour le modèle."""
+
+    if len(conclusion_text) <= _CONCLUSION_MAX_CHARS:
+        return conclusion_text
+
+    _LOGGER.debug(
+        "Truncating report conclusion from %s to %s characters",
+        len(conclusion_text),
+        _CONCLUSION_HEAD_CHARS + _CONCLUSION_TAIL_CHARS,
+    )
+    return (
+        conclusion_text[:_CONCLUSION_HEAD_CHARS]
+        + _TRUNCATION_MARKER
+        + conclusion_text[-_CONCLUSION_TAIL_CHARS:]
+    )
+
+
+def _cache_key(conclusion_text: str, language: str) -> str:
+    """Retourner la clé de cache d'une conclusion dans une langue donnée.
+
+    Seuls les espaces sont normalisés : des conclusions qui ne diffèrent que
+    par leurs espacements ou retours à la ligne partagent le même conseil.
+    """
+
+    normalized = " ".join(conclusion_text.split())
+    return hashlib.sha256(f"{language}\0{normalized}".encode()).hexdigest()
+
+
+async def async_load_advice_cache(hass: HomeAssistant) -> None:
+    """Charger les conseils persistés lors d'une exécution précédente."""
+
+    global _STORE
+
+    if _STORE is not None:
+        return
+
+    _STORE = Store(hass, _STORAGE_VERSION, _STORAGE_KEY)
+    data = await _STORE.async_load()
+    if not isinstance(data, dict):
+        return
+
+    entries = data.get("entries")
+    if not isinstance(entries, list):
+        return
+
+    now_wall_ns = time.time_ns()
+    now_ns = time.monotonic_ns()
+    for entry in entries:
+        if not isinstance(entry, list) or len(entry) != 3:
+            continue
+        key, saved_at, advice = entry
+        if (
+            not isinstance(key, str)
+            or not isinstance(saved_at, (int, float))
+            or not isinstance(advice, str)
+        ):
+            continue
+        age_ns = now_wall_ns - int(saved_at * 1_000_000_000)
+        if age_ns < 0 or age_ns >= _CACHE_TTL_NS:
+            continue
+        _RESPONSE_CACHE[key] = (now_ns - age_ns, advice)
+
+    while len(_RESPONSE_CACHE) > _CACHE_MAX_ENTRIES:
+        del _RESPONSE_CACHE[next(iter(_RESPONSE_CACHE))]
+
+
+def _advice_cache_data() -> dict[str, Any]:
+    """Sérialiser le cache en horodatages absolus pour le stockage."""
+
+    now_wall_ns = time.time_ns()
+    now_ns = time.monotonic_ns()
+    return {
+        "entries": [
+            [key, (now_wall_ns - (now_ns - stored_at)) / 1_000_000_000, advice]
+            for key, (stored_at, advice) in _RESPONSE_CACHE.items()
+            if now_ns - stored_at < _CACHE_TTL_NS
+        ]
+    }
+
+
+def _get_cached_advice(key: str) -> str | None:
+    """Retourner un conseil en cache s'il est encore valide."""
+
+    entry = _RESPONSE_CACHE.get(key)
+    if entry is None:
+        return None
+
+    stored_at, advice = entry
+    if time.monotonic_ns() - stored_at >= _CACHE_TTL_NS:
+        del _RESPONSE_CACHE[key]
+        return None
+
+    return advice
+
+
+def _store_cached_advice(key: str, advice: str) -> None:
+    """Mémoriser un conseil en évinçant les entrées les plus anciennes."""
+
+    _RESPONSE_CACHE.pop(key, None)
+    _RESPONSE_CACHE[key] = (time.monotonic_ns(), advice)
+    while len(_RESPONSE_CACHE) > _CACHE_MAX_ENTRIES:
+        del _RESPONSE_CACHE[next(iter(_RESPONSE_CACHE))]
+
+    if _STORE is not None:
+        _STORE.async_delay_save(_advice_cache_data, _STORAGE_SAVE_DELAY)
+
+
+async def generate_advice(
+    session: aiohttp.ClientSession,
+    conclusion: str,
+    api_key: str | None,
+    language: str,
+) -> str:
+    """Générer un conseil professionnel personnalisé depuis OpenAI.
+
+    La session partagée de Home Assistant est réutilisée afin de conserver
+    la connexion TLS vers l'API ouverte entre deux rapports. Les appels
+    simultanés pour une même conclusion partagent une seule requête.
+    """
+
+    normalized_api_key = (api_key or "").strip()
+    conclusion_text = (conclusion or "").strip()
+
+    fallback_message = get_fallback_message(language)
+
+    if not normalized_api_key:
         return fallback_message
-    except aiohttp.ClientError as err:
-        _LOGGER.warning("OpenAI API request failed: %s", err)
+
+    if not conclusion_text:
         return fallback_message
 
+    conclusion_text = _truncate_conclusion(conclusion_text)
+    cache_key = _cache_key(conclusion_text, language)
+    cached_advice = _get_cached_advice(cache_key)
+    if cached_advice is not None:
+        _LOGGER.debug("Using cached OpenAI advice")
+        return cached_advice
+
+    task = _INFLIGHT.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(
+            _async_fetch_advice(
+                session, conclusion_text, normalized_api_key, language, cache_key
+            )
+        )
+        _INFLIGHT[cache_key] = task
+        task.add_done_callback(lambda _: _INFLIGHT.pop(cache_key, None))
+    else:
+        _LOGGER.debug("Joining in-flight OpenAI advice request")
+
+    # Le bouclier évite qu'un appelant annulé n'interrompe les autres.
+    advice = await asyncio.shield(task)
+    return advice or fallback_message
+
+
+async def _async_fetch_advice(
+    session: aiohttp.ClientSession,
+    conclusion_text: str,
+    api_key: str,
+    language: str,
+    cache_key: str,
+) -> str | None:
+    """Interroger OpenAI et mettre le conseil obtenu en cache."""
+
+    # Seule la conclusion varie : elle est échappée en JSON puis insérée
+    # dans le corps pré-sérialisé de la langue.
+    escaped_conclusion = json_bytes(conclusion_text)[1:-1]
+    body = _PAYLOAD_TEMPLATES[language].replace(
+        _CONCLUSION_PLACEHOLDER.encode(), escaped_conclusion, 1
+    )
+
+    headers = {**_BASE_HEADERS, "Authorization": f"Bearer {api_key}"}
+
+    body_bytes = await _async_request_completion(session, body, headers)
+    if body_bytes is None:
+        return None
+
+    try:
+        data = json_loads(body_bytes)
+    except ValueError:
+        _LOGGER.warning("Invalid JSON in OpenAI API response")
+        return None
+
     try:
         choice = data["choices"][0]
         message = choice.get("message", {})
         content = message.get("content")
     except (KeyError, IndexError, TypeError):
         _LOGGER.warning("Unexpected OpenAI API response structure: %s", data)
-        return fallback_message
+        return None
 
     if isinstance(content, str):
         advice = content.strip()
     elif isinstance(content, list):
-        advice_parts: list[str] = []
-        for item in content:
-            if isinstance(item, dict):
-                text_part = item.get("text")
-                if isinstance(text_part, str):
-                    advice_parts.append(text_part)
-        advice = "".join(advice_parts).strip()
+        advice = "".join(
+            text_part
+            for item in content
+            if isinstance(item, dict)
+            and isinstance(text_part := item.get("text"), str)
+        ).strip()
     else:
         advice = ""
 
     if not advice:
-        return fallback_message
+        return None
 
+    _store_cached_advice(cache_key, advice)
     return advice
 
 
-__all__ = ["generate_advice", "FALLBACK_MESSAGES", "get_fallback_message"]
+__all__ = [
+    "async_load_advice_cache",
+    "generate_advice",
+    "FALLBACK_MESSAGES",
+    "get_fallback_message",
+]
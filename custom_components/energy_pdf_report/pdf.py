@@ -1,12 +1,16 @@
 """Génération de rapports PDF pour l'intégration energy_pdf_report."""
 
+import atexit
 import base64
+import re
+import shutil
 import zlib
-from contextlib import ExitStack
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from tempfile import mkdtemp
+from threading import Lock
 
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
@@ -31,6 +35,7 @@ BORDER_COLOR = (222, 230, 236)
 ZEBRA_COLORS = ((255, 255, 255), (245, 249, 252))
 TOTAL_FILL_COLOR = (235, 239, 243)
 TOTAL_TEXT_COLOR = (87, 96, 106)
+_EMPHASIZED_ROW_STYLE = (TOTAL_FILL_COLOR, TOTAL_TEXT_COLOR, "B")
 SECTION_SPACING = 9
 SECTION_TITLE_SPACING = 4
 TABLE_BOTTOM_SPACING = 3
@@ -86,46 +91,56 @@ def _decode_font(encoded: str) -> bytes:
     return zlib.decompress(base64.b64decode(encoded))
 
 
-class _TemporaryFontCache:
-    """Stockage temporaire des polices nécessaires à FPDF."""
+# Polices décodées une seule fois pour toute la durée de vie du processus.
+_DECODED_FONTS: Dict[str, bytes] = {
+    filename: _decode_font(encoded) for filename, encoded in FONT_DATA.items()
+}
+
+
+_font_directory: Optional[Path] = None
+_FONT_DIRECTORY_LOCK = Lock()
+
+
+def _shared_font_directory() -> Path:
+    """Retourner le répertoire de polices partagé par tous les rapports.
 
-    def __init__(self) -> None:
-        self._tempdir = TemporaryDirectory(prefix="energy_pdf_report_fonts_")
-        self.directory = Path(self._tempdir.name)
-        self._populate()
+    Les fichiers TTF sont écrits une seule fois par processus puis supprimés à
+    l'arrêt ; le répertoire est recréé s'il a été purgé entre-temps.
+    """
 
-    def _populate(self) -> None:
-        for filename, encoded in FONT_DATA.items():
-            (self.directory / filename).write_bytes(_decode_font(encoded))
+    global _font_directory
 
-    def cleanup(self) -> None:
-        self._tempdir.cleanup()
+    with _FONT_DIRECTORY_LOCK:
+        directory = _font_directory
+        if directory is None or not all(
+            (directory / filename).is_file() for filename in _DECODED_FONTS
+        ):
+            directory = Path(mkdtemp(prefix="energy_pdf_report_fonts_"))
+            for filename, data in _DECODED_FONTS.items():
+                (directory / filename).write_bytes(data)
+            atexit.register(shutil.rmtree, directory, ignore_errors=True)
+            _font_directory = directory
+        return directory
 
 
-def _register_unicode_fonts(pdf: FPDF) -> Optional[_TemporaryFontCache]:
-    """Enregistrer les polices Unicode sur le PDF et retourner le cache."""
+def _register_unicode_fonts(pdf: FPDF) -> None:
+    """Enregistrer les polices Unicode sur le PDF."""
 
     missing_styles = [
         style for style in _FONT_FILES if f"{FONT_FAMILY.lower()}{style}" not in pdf.fonts
     ]
 
     if not missing_styles:
-        return None
-
-    cache = _TemporaryFontCache()
-
-    for style, filename in _FONT_FILES.items():
-        font_key = f"{FONT_FAMILY.lower()}{style}"
-        if font_key in pdf.fonts:
-            continue
-
-        pdf.add_font(FONT_FAMILY, style, str(cache.directory / filename), uni=True)
+        return
 
-    return cache
+    directory = _shared_font_directory()
 
+    for style in missing_styles:
+        filename = _FONT_FILES[style]
+        pdf.add_font(FONT_FAMILY, style, str(directory / filename), uni=True)
 
-@dataclass
 
+@dataclass(frozen=True, slots=True)
 class TableConfig:
     """Configuration d'un tableau à insérer dans le PDF."""
 
@@ -210,8 +225,9 @@ class EnergyPDFBuilder:
         self._translations = translations
         self._pdf = EnergyReportPDF(title, period_label, generated_at, translations)
         self._pdf.set_auto_page_break(auto=True, margin=18)
+        self._pdf.set_compression(True)
         self._pdf.alias_nb_pages()
-        self._font_cache = _register_unicode_fonts(self._pdf)
+        _register_unicode_fonts(self._pdf)
 
         self._logo_path = self._validate_logo(logo_path)
         self._content_started = False
@@ -219,12 +235,16 @@ class EnergyPDFBuilder:
         self._pdf.set_creator("Home Assistant")
         self._pdf.set_author("energy_pdf_report")
         self._default_text_color = TEXT_COLOR
+        # Les marges sont fixées une fois pour toutes par EnergyReportPDF.
+        self._available_width_cached = (
+            self._pdf.w - self._pdf.l_margin - self._pdf.r_margin
+        )
 
     @property
     def _available_width(self) -> float:
         """Retourner la largeur disponible pour le contenu."""
 
-        return self._pdf.w - self._pdf.l_margin - self._pdf.r_margin
+        return self._available_width_cached
 
     def add_cover_page(
         self,
@@ -297,8 +317,8 @@ class EnergyPDFBuilder:
     def add_table(self, config: TableConfig) -> None:
         """Ajouter un tableau structuré."""
 
-        headers = list(config.headers)
-        rows = list(config.rows)
+        headers = _as_sequence(config.headers)
+        rows = _as_sequence(config.rows)
         if not headers:
             return
 
@@ -336,19 +356,19 @@ class EnergyPDFBuilder:
             return
 
         emphasize = set(config.emphasize_rows or [])
+        zebra_styles = tuple(
+            (fill_color, self._default_text_color, "") for fill_color in ZEBRA_COLORS
+        )
 
         for index, row in enumerate(rows):
             str_row = ["" if value is None else str(value) for value in row]
             if decorate_first_column and str_row:
                 str_row[0] = _decorate_category(str_row[0])
-            fill_color = ZEBRA_COLORS[index % 2]
-            text_color = self._default_text_color
-            font_style = ""
-
-            if index in emphasize:
-                fill_color = TOTAL_FILL_COLOR
-                text_color = TOTAL_TEXT_COLOR
-                font_style = "B"
+            fill_color, text_color, font_style = (
+                _EMPHASIZED_ROW_STYLE
+                if index in emphasize
+                else zebra_styles[index % 2]
+            )
 
             self._draw_row(
                 str_row,
@@ -376,9 +396,17 @@ class EnergyPDFBuilder:
         if not series:
             return
 
-
-        values = [value for _, value, _ in series]
-        if not any(abs(value) > 1e-6 for value in values):
+        positive_max = 0.0
+        negative_min = 0.0
+        has_nonzero = False
+        for _, value, _ in series:
+            if abs(value) > 1e-6:
+                has_nonzero = True
+            if value > positive_max:
+                positive_max = value
+            elif value < negative_min:
+                negative_min = value
+        if not has_nonzero:
             return
 
         units = {unit for _, _, unit in series if unit}
@@ -427,8 +455,6 @@ class EnergyPDFBuilder:
         self._pdf.rect(chart_left, chart_top, chart_width, chart_height)
 
         bar_area_left = chart_left + label_width + 4
-        positive_max = max((value for value in values if value > 0), default=0.0)
-        negative_min = min((value for value in values if value < 0), default=0.0)
 
         if positive_max > 0 and negative_min < 0:
             total_span = positive_max + abs(negative_min)
@@ -508,19 +534,15 @@ class EnergyPDFBuilder:
 
         """Sauvegarder le PDF en garantissant le nettoyage des ressources."""
 
-        with ExitStack() as stack:
-            stack.callback(self._cleanup_resources)
+        try:
             self._pdf.output(path)
+        finally:
+            self._cleanup_resources()
 
 
     def _cleanup_resources(self) -> None:
         """Nettoyer les répertoires temporaires."""
 
-        cache = getattr(self, "_font_cache", None)
-        if cache is not None:
-            cache.cleanup()
-            self._font_cache = None
-
         assets_cache = getattr(self, "_assets_cache", None)
         if assets_cache is not None:
             assets_cache.cleanup()
@@ -547,19 +569,26 @@ class EnergyPDFBuilder:
 
         font_style: str = "",
     ) -> None:
-        """Dessiner une ligne du tableau."""
+        """Dessiner une ligne du tableau.
 
+        Réservé à ``add_table``, qui garantit qu'une page de contenu est ouverte.
+        """
+
+        pdf = self._pdf
         if fill_color is not None:
-            self._pdf.set_fill_color(*fill_color)
+            pdf.set_fill_color(*fill_color)
         if text_color is not None:
-            self._pdf.set_text_color(*text_color)
-        self._pdf.set_font(FONT_FAMILY, font_style, 10)
-        self._ensure_space(height)
+            pdf.set_text_color(*text_color)
+        pdf.set_font(FONT_FAMILY, font_style, 10)
+
+        if pdf.get_y() + height > pdf.page_break_trigger:
+            pdf.add_page()
 
-        for index, (value, width) in enumerate(zip(row, column_widths)):
-            align = "R" if index == len(row) - 1 else "L"
-            self._pdf.cell(width, height, value, border=1, align=align, fill=fill)
-        self._pdf.ln(height)
+        aligns = _column_alignments(len(row))
+        cell = pdf.cell
+        for value, width, align in zip(row, column_widths, aligns):
+            cell(width, height, value, border=1, align=align, fill=fill)
+        pdf.ln(height)
 
     def _ensure_space(self, height: float) -> None:
         """Ajouter une page si besoin."""
@@ -577,6 +606,24 @@ class EnergyPDFBuilder:
         return None
 
 
+def _as_sequence(values: Iterable[Any]) -> Sequence[Any]:
+    """Retourner une séquence, sans copier les listes et tuples existants."""
+
+    if isinstance(values, (list, tuple)):
+        return values
+    return list(values)
+
+
+@lru_cache(maxsize=16)
+def _column_alignments(count: int) -> Tuple[str, ...]:
+    """Retourner l'alignement des colonnes : texte à gauche, dernière à droite."""
+
+    if count <= 0:
+        return ()
+    return ("L",) * (count - 1) + ("R",)
+
+
+@lru_cache(maxsize=256)
 def _decorate_category(label: str) -> str:
     """Ajouter une icône appropriée devant une catégorie si disponible."""
 
@@ -588,6 +635,7 @@ def _decorate_category(label: str) -> str:
     return normalized
 
 
+@lru_cache(maxsize=256)
 def _get_category_color(label: str) -> Tuple[int, int, int]:
     """Choisir une couleur fixe en fonction de la catégorie."""
 
@@ -608,6 +656,15 @@ def _format_measure(value: float, unit: Optional[str]) -> str:
 def _format_number(value: float) -> str:
     """Formater un nombre pour l'affichage dans le PDF."""
 
+    if value == 0:
+        # 0.0 et -0.0 partagent la même clé de cache mais pas le même rendu.
+        return _format_number_uncached(value)
+    return _format_number_cached(value)
+
+
+def _format_number_uncached(value: float) -> str:
+    """Formater un nombre sans passer par le cache."""
+
     magnitude = abs(value)
     if magnitude >= 1000:
         formatted = f"{value:,.0f}"
@@ -618,6 +675,9 @@ def _format_number(value: float) -> str:
     return formatted.replace(",", " ")
 
 
+_format_number_cached = lru_cache(maxsize=4096)(_format_number_uncached)
+
+
 
 _MISSING_VALUE = "—"
 
@@ -648,16 +708,7 @@ def build_comparison_section(
     )
 
     rows: list[tuple[str, str, str, str, str]] = []
-    seen_keys: set[str] = set()
-    seen_labels: set[str] = set()
-    for key, label_attr, fallback_unit in _COMPARISON_ROWS:
-        if key in seen_keys:
-            continue
-        label = getattr(translations, label_attr)
-        if label in seen_labels:
-            continue
-        seen_keys.add(key)
-        seen_labels.add(label)
+    for key, label, fallback_unit in _resolve_comparison_rows(translations):
         unit = (
             primary_units.get(key)
             or comparison_units.get(key)
@@ -693,6 +744,37 @@ def build_comparison_section(
     )
 
 
+def _resolve_comparison_rows(
+    translations: ReportTranslations,
+) -> Tuple[Tuple[str, str, str | None], ...]:
+    """Retourner les lignes de comparaison avec leurs libellés traduits.
+
+    Les doublons de clé ou de libellé sont écartés ; le résultat est mémorisé
+    par langue puisqu'il ne dépend que des traductions.
+    """
+
+    cached = _RESOLVED_COMPARISON_ROWS.get(translations.language)
+    if cached is not None and cached[0] is translations:
+        return cached[1]
+
+    resolved: list[tuple[str, str, str | None]] = []
+    seen_keys: set[str] = set()
+    seen_labels: set[str] = set()
+    for key, label_attr, fallback_unit in _COMPARISON_ROWS:
+        if key in seen_keys:
+            continue
+        label = getattr(translations, label_attr)
+        if label in seen_labels:
+            continue
+        seen_keys.add(key)
+        seen_labels.add(label)
+        resolved.append((key, label, fallback_unit))
+
+    rows = tuple(resolved)
+    _RESOLVED_COMPARISON_ROWS[translations.language] = (translations, rows)
+    return rows
+
+
 def _aggregate_comparison_values(
     metrics: Sequence[Any],
     context: Any,
@@ -725,6 +807,7 @@ def _aggregate_comparison_values(
         )
     }
     units: dict[str, str] = {key: "" for key in aggregated}
+    buckets: dict[str, list[float]] = {key: [] for key in aggregated}
 
     for metric in metrics:
         statistic_id = getattr(metric, "statistic_id", None)
@@ -740,11 +823,14 @@ def _aggregate_comparison_values(
 
         unit = _metadata_unit(metadata.get(statistic_id))
         for key in keys:
-            current = aggregated[key]
-            aggregated[key] = total if current is None else current + total
+            buckets[key].append(total)
             if not units[key] and unit:
                 units[key] = unit
 
+    aggregated.update(
+        (key, sum(values)) for key, values in buckets.items() if values
+    )
+
     if not units.get("co2"):
         units["co2"] = "kgCO₂e"
 
@@ -787,7 +873,28 @@ def _inject_summary_values(
             units["untracked_consumption"] = energy_unit
 
 
-def _classify_metric_category(category: str) -> set[str]:
+def _keyword_pattern(*keywords: str) -> re.Pattern[str]:
+    """Compiler une alternative de mots-clés recherchés n'importe où."""
+
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+
+_BATTERY_PATTERN = _keyword_pattern("batter")
+_DISCHARGE_PATTERN = _keyword_pattern("décharge", "decharge", "discharge", "unload")
+_CHARGE_PATTERN = _keyword_pattern("charge", "charging", "load")
+_CONSUMPTION_PATTERN = _keyword_pattern("consommation", "consumption")
+_WATER_PATTERN = _keyword_pattern("eau", "water", "wasser", "acqua")
+_GAS_PATTERN = _keyword_pattern(
+    "gaz", "gas", "gás", "gaso", "fioul", "mazout", "fuel", "oil"
+)
+_EXPENSES_PATTERN = _keyword_pattern("coût", "cout", "cost", "dépense", "depense")
+_INCOME_PATTERN = _keyword_pattern("compensation", "revenu", "income")
+_CO2_PATTERN = _keyword_pattern("co2", "émission", "emission")
+_DEVICE_PATTERN = _keyword_pattern("appareil", "device")
+
+
+@lru_cache(maxsize=256)
+def _classify_metric_category(category: str) -> frozenset[str]:
     """Déterminer les catégories de comparaison associées à un libellé de métrique."""
 
     lowered = category.lower()
@@ -795,26 +902,19 @@ def _classify_metric_category(category: str) -> set[str]:
 
     result: set[str] = set()
 
-    battery_related = "batter" in lowered
-    discharge_keywords = ("décharge", "decharge", "discharge", "unload")
-    charge_keywords = ("charge", "charging", "load")
-
-    if battery_related and any(keyword in lowered for keyword in discharge_keywords):
-        result.add("battery_discharge")
-    if battery_related and any(keyword in lowered for keyword in charge_keywords):
-        if not any(keyword in lowered for keyword in discharge_keywords):
+    if _BATTERY_PATTERN.search(lowered):
+        if _DISCHARGE_PATTERN.search(lowered):
+            result.add("battery_discharge")
+        elif _CHARGE_PATTERN.search(lowered):
             result.add("battery_charge")
 
-    is_consumption = "consommation" in lowered or "consumption" in lowered
-    if is_consumption:
+    if _CONSUMPTION_PATTERN.search(lowered):
         result.add("consumption")
 
-        water_keywords = ("eau", "water", "wasser", "acqua")
-        if any(keyword in lowered for keyword in water_keywords):
+        if _WATER_PATTERN.search(lowered):
             result.add("consumption_water")
 
-        gas_keywords = ("gaz", "gas", "gás", "gaso", "fioul", "mazout", "fuel", "oil")
-        if any(keyword in lowered for keyword in gas_keywords):
+        if _GAS_PATTERN.search(lowered):
             result.add("consumption_gas")
 
     if "production" in lowered:
@@ -823,16 +923,16 @@ def _classify_metric_category(category: str) -> set[str]:
         result.add("import")
     if "export" in lowered:
         result.add("export")
-    if any(keyword in lowered for keyword in ("coût", "cout", "cost", "dépense", "depense")):
+    if _EXPENSES_PATTERN.search(lowered):
         result.add("expenses")
-    if any(keyword in lowered for keyword in ("compensation", "revenu", "income")):
+    if _INCOME_PATTERN.search(lowered):
         result.add("income")
-    if any(keyword in lowered for keyword in ("co2", "émission", "emission")):
+    if _CO2_PATTERN.search(lowered):
         result.add("co2")
-    if any(keyword in lowered for keyword in ("appareil", "device")):
+    if _DEVICE_PATTERN.search(lowered):
         result.add("device_consumption")
 
-    return result
+    return frozenset(result)
 
 
 def _metadata_unit(entry: Any) -> str:
@@ -931,5 +1031,9 @@ _COMPARISON_ROWS: Tuple[Tuple[str, str, str | None], ...] = (
     ("consumption_gas", "comparison_gas_consumption_label", None),
 )
 
+_RESOLVED_COMPARISON_ROWS: Dict[
+    str, Tuple[ReportTranslations, Tuple[Tuple[str, str, str | None], ...]]
+] = {}
+
 
 __all__ = ["EnergyPDFBuilder", "TableConfig", "build_comparison_section"]